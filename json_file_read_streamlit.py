@@ -1,8 +1,36 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import json
-import re
-from io import StringIO
+from io import BytesIO
+
+# orjson is an optional, much faster drop-in for the stdlib JSON parser
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# pyarrow is optional; its JSON reader parses newline-delimited records in parallel,
+# with pandas' line reader as the fallback
+try:
+    import pyarrow.json as paj
+except ImportError:
+    paj = None
+
+# Prefixes that mark a string value as a clickable URL
+URL_PREFIXES = ('http://', 'https://')
+# Leading rows sampled for URL detection, so about 10 non-empty values usually survive
+URL_SAMPLE_ROWS = 50
+
+# Columns that get a dropdown filter when present in the data
+FILTER_COLS = ["topic_name", "publisher", "publication_type"]
+
+# CSV uploads above this size are indexed by byte offset instead of loaded fully
+LARGE_CSV_BYTES = 200 * 1024 * 1024
+# Approximate size of the record-aligned byte segments a large CSV is split into
+CSV_SEGMENT_BYTES = 4 * 1024 * 1024
+# Filtered results of a large CSV up to this many rows can be downloaded
+LARGE_CSV_EXPORT_ROWS = 100_000
 
 # --- Set up the page configuration ---
 st.set_page_config(
@@ -11,23 +39,61 @@ st.set_page_config(
     layout="wide"
 )
 
+# --- Define a function to decode raw JSON bytes ---
+def parse_json_bytes(raw: bytes):
+    """
+    Decodes JSON with orjson when installed, falling back to the stdlib parser.
+    orjson is stricter (it rejects NaN/Infinity and a UTF-8 BOM), so anything
+    it refuses is retried with json before being treated as malformed.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(raw)
+
+# --- Define a function to read newline-delimited JSON records ---
+def read_json_lines(raw: bytes):
+    """
+    Reads JSON Lines (one object per line) into a DataFrame, or returns None.
+    Arrow's columnar parser is tried first when pyarrow is installed; pandas
+    handles what it rejects, such as a column whose type changes between lines.
+    """
+    if paj is not None:
+        try:
+            return paj.read_json(BytesIO(raw)).to_pandas()
+        except ValueError:
+            pass
+    try:
+        return pd.read_json(BytesIO(raw), lines=True)
+    except ValueError:
+        return None
+
 # --- Define a function to intelligently load nested JSON data ---
-@st.cache_data
 def load_nested_json(file_content):
     """
     Loads JSON data. If the top level is a dict, it attempts to find 
     the list of records to convert to a DataFrame.
+    Newline-delimited records (JSON Lines) are read with read_json_lines.
     """
+    # Need to read the content of the uploaded file
+    raw = file_content.read()
     try:
-        # Need to read the content of the uploaded file
-        # For JSON, we use file_content directly in json.load
-        data = json.load(file_content)
+        data = parse_json_bytes(raw)
     except json.JSONDecodeError:
-        # File is likely empty or malformed
-        return None, "Error: Could not decode JSON. File may be malformed or empty."
+        # Not a single JSON document: it may hold one object per line
+        df = read_json_lines(raw)
+        if df is None or df.empty:
+            # File is likely empty or malformed
+            return None, "Error: Could not decode JSON. File may be malformed or empty."
+        return df, None
 
     # Case 1: Data is already a list (standard JSON array of objects)
     if isinstance(data, list):
+        if data and isinstance(data[0], dict):
+            # Build columns straight from the records
+            return pd.DataFrame.from_records(data), None
         return pd.DataFrame(data), None
 
     # Case 2: Data is a dict (nested structure)
@@ -36,7 +102,7 @@ def load_nested_json(file_content):
         # Heuristic: Find the first value that is a non-empty list
         for key, value in data.items():
             if isinstance(value, list) and len(value) > 0 and isinstance(value[0], dict):
-                return pd.DataFrame(value), None
+                return pd.DataFrame.from_records(value), None
 
         # Fallback: Try to normalize the entire dictionary
         try:
@@ -49,6 +115,64 @@ def load_nested_json(file_content):
         # E.g., a simple string or integer at the root
         return None, "Error: JSON root element is not a list or dictionary."
 
+# --- Define a function to parse the uploaded file ---
+def load_dataframe(name: str, raw: bytes):
+    """
+    Parses the raw bytes of an uploaded file into a DataFrame.
+    Called once per upload; the result lives in st.session_state, so reruns skip parsing.
+    Returns a (DataFrame, error message) tuple like load_nested_json.
+    """
+    df, error_message = None, None
+    if name.endswith('.csv'):
+        # The C parser reads the raw bytes directly; low_memory=False infers
+        # each column's dtype in one pass instead of per internal chunk
+        df = pd.read_csv(BytesIO(raw), engine='c', low_memory=False)
+    elif name.endswith('.json'):
+        # Use the specialized JSON loading function
+        df, error_message = load_nested_json(BytesIO(raw))
+
+    if df is not None:
+        if paj is not None:
+            # With pyarrow installed, back columns with Arrow arrays so strings are
+            # handed to st.dataframe as Arrow buffers instead of boxed Python objects
+            df = df.convert_dtypes(dtype_backend='pyarrow')
+        # Store filter columns as categories so filtering compares integer codes
+        for col_name in FILTER_COLS:
+            if col_name in df.columns:
+                try:
+                    df[col_name] = df[col_name].astype("category")
+                except TypeError:
+                    # Unhashable values (e.g. nested lists) are categorized by their text
+                    df[col_name] = df[col_name].astype(str).astype("category")
+                if pd.api.types.infer_dtype(df[col_name].cat.categories).startswith("mixed"):
+                    # Mixed-type categories (e.g. 1 and "1") cannot be sent to the browser
+                    # as Arrow, so categorize the non-missing values by their text
+                    values = df[col_name].astype(object)
+                    df[col_name] = values.mask(values.notna(), values.astype(str)).astype("category")
+    return df, error_message
+
+# --- Define a function to match a categorical column against a filter value ---
+def category_mask(series: pd.Series, value: str) -> np.ndarray:
+    """
+    Returns a boolean mask of rows whose category, coerced to string,
+    equals value. Only the categories are cast, never the full column.
+    """
+    matching_codes = np.flatnonzero(series.cat.categories.astype(str) == value)
+    return np.isin(series.cat.codes.to_numpy(), matching_codes)
+
+# --- Define a function to apply the dropdown filters to a DataFrame ---
+def filter_rows(df: pd.DataFrame, active_filters: dict) -> np.ndarray:
+    """
+    Returns the positions of the rows of df matching every active filter.
+    Filters are combined into a single boolean mask; rows are only
+    materialized later, one page at a time.
+    """
+    mask = np.ones(len(df), dtype=bool)
+    for col, value in active_filters.items():
+        # Compare category codes (coerced to string for consistent comparison)
+        mask &= category_mask(df[col], value)
+    return np.flatnonzero(mask)
+
 # --- Define a function to detect and configure URL columns ---
 def detect_url_columns(df: pd.DataFrame) -> dict:
     """
@@ -57,11 +181,16 @@ def detect_url_columns(df: pd.DataFrame) -> dict:
     """
     url_cols_config = {}
     for col in df.columns:
-        # Heuristic: Check if the column is of 'object' (string) type
-        # and if the first 10 non-empty values look like a URL.
+        # Heuristic: Check if the column holds strings (object, string or
+        # pyarrow string dtype) and if the first 10 non-empty values look like a URL.
+        if not pd.api.types.is_string_dtype(df[col].dtype):
+            continue
         sample_values = df[col].dropna().head(10)
-        # Ensure the values are strings before checking the regex
-        if df[col].dtype == 'object' and any(isinstance(val, str) and re.match(r'https?://', val) for val in sample_values):
+        if sample_values.dtype == 'object':
+            # Mixed object columns may hold non-strings; cast so .str applies
+            sample_values = sample_values.astype(str)
+        # Vectorized prefix check instead of a per-value regex match
+        if sample_values.str.startswith(URL_PREFIXES).any():
             url_cols_config[col] = st.column_config.LinkColumn(
                 f"{col} (Link)",
                 help=f"Click to open the link in {col}",
@@ -69,6 +198,186 @@ def detect_url_columns(df: pd.DataFrame) -> dict:
             )
     return url_cols_config
 
+# --- Define functions to build the CSV download ---
+def dataframe_to_csv_bytes(df: pd.DataFrame) -> bytes:
+    """
+    Serializes a DataFrame to UTF-8 CSV bytes.
+    Encoded bytes go straight into the buffer, skipping an intermediate str.
+    """
+    buffer = BytesIO()
+    df.to_csv(buffer, index=False, encoding='utf-8')
+    return buffer.getvalue()
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def csv_bytes(_df: pd.DataFrame, file_id: str, active_filters: tuple, selected_cols: tuple) -> bytes:
+    """
+    Serializes the filtered and column-selected data to CSV bytes.
+    The DataFrame argument is not hashed; the cache is keyed on the upload
+    id plus the filter and column state, so lookups stay cheap.
+    Only the last few exports are kept, since each is a full copy of its data.
+    """
+    df = _df.take(filter_rows(_df, dict(active_filters))) if active_filters else _df
+    return dataframe_to_csv_bytes(df[list(selected_cols)])
+
+# --- Define functions to read a large CSV by byte offset ---
+def next_record_end(raw: bytes, start: int, pos: int) -> int:
+    """
+    Returns the offset just past the first newline at or after pos that lies
+    outside a quoted field, given that start is a record boundary.
+    Quote parity is tracked with bytes.count, so the scan stays in C.
+    """
+    quotes = raw.count(b'"', start, pos)
+    while True:
+        newline = raw.find(b'\n', pos)
+        if newline == -1:
+            return len(raw)
+        quotes += raw.count(b'"', pos, newline)
+        if quotes % 2 == 0:
+            return newline + 1
+        pos = newline + 1
+
+def index_large_csv(raw: bytes):
+    """
+    Splits a large CSV into byte segments that end on record boundaries.
+    A single pass parses only the filter columns (or the first column) of
+    each segment, to count its rows and collect the filter values.
+    Returns the header length, a (start, stop, first row) array with one
+    entry per segment, and a DataFrame of the categorical filter columns.
+    """
+    header_end = next_record_end(raw, 0, 0)
+    header = raw[:header_end]
+    columns = pd.read_csv(BytesIO(header), nrows=0).columns
+    filter_cols = [col_name for col_name in FILTER_COLS if col_name in columns]
+    
+    segments, parts = [], []
+    start, first_row = header_end, 0
+    while start < len(raw):
+        stop = next_record_end(raw, start, min(start + CSV_SEGMENT_BYTES, len(raw)))
+        part = pd.read_csv(BytesIO(header + raw[start:stop]), usecols=filter_cols or [0], dtype=str)
+        segments.append((start, stop, first_row))
+        parts.append(part)
+        first_row += len(part)
+        start = stop
+    
+    # Merge each filter column's per-segment categories into one set of codes
+    filter_df = pd.DataFrame(
+        {
+            col_name: pd.api.types.union_categoricals(
+                [part[col_name].astype("category") for part in parts]
+            )
+            for col_name in (filter_cols if parts else [])
+        },
+        index=pd.RangeIndex(first_row)
+    )
+    return header_end, np.array(segments, dtype=np.int64).reshape(-1, 3), filter_df
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def read_csv_segment(file_id: str, start: int, stop: int, _raw: bytes, header_end: int) -> pd.DataFrame:
+    """
+    Parses one record-aligned byte range of a large CSV, header prepended.
+    Only a few segments are kept, enough for paging back and forth.
+    The raw buffer is not hashed; the cache is keyed on the upload id.
+    """
+    return pd.read_csv(BytesIO(_raw[:header_end] + _raw[start:stop]))
+
+def read_csv_rows(file_id: str, raw: bytes, csv_index: tuple, positions: np.ndarray) -> pd.DataFrame:
+    """
+    Materializes the rows at the given (sorted) positions of a large CSV,
+    parsing only the segments that contain them.
+    """
+    header_end, segments = csv_index
+    segment_ids = np.searchsorted(segments[:, 2], positions, side='right') - 1
+    pieces = []
+    for segment_id in np.unique(segment_ids):
+        start, stop, first_row = segments[segment_id]
+        segment_df = read_csv_segment(file_id, int(start), int(stop), raw, header_end)
+        pieces.append(segment_df.take(positions[segment_ids == segment_id] - first_row))
+    return pd.concat(pieces) if pieces else pd.DataFrame()
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def large_csv_bytes(file_id: str, active_filters: tuple, selected_cols: tuple,
+                    _raw: bytes, _csv_index: tuple, _positions: np.ndarray) -> bytes:
+    """
+    Serializes the filtered rows of a large CSV to CSV bytes, parsing only
+    the segments that hold them. Keyed like csv_bytes; the file, its index
+    and the row positions are not hashed.
+    """
+    df = read_csv_rows(file_id, _raw, _csv_index, _positions)
+    return dataframe_to_csv_bytes(df[list(selected_cols)])
+
+# --- Define a callback for the navigation buttons ---
+def change_page(step: int, total_pages: int):
+    """
+    Moves step pages if the result stays in range. As a button callback it
+    runs before the rerun the click triggers, so no extra st.rerun() is needed.
+    """
+    new_page = st.session_state.page + step
+    st.session_state.page_changed = 0 <= new_page < total_pages
+    if st.session_state.page_changed:
+        st.session_state.page = new_page
+
+# --- Define a fragment to render the current page with its navigation ---
+@st.fragment
+def show_data_page(fetch_page, total_rows: int, url_config: dict, csv_data=None):
+    """
+    Renders the pagination controls, the current page of data and the
+    navigation buttons. fetch_page(start, stop) returns the rows to show,
+    so only the visible page is ever materialized. The download button is
+    shown when csv_data is given.
+    As a fragment, paging reruns only this function, not the loading,
+    filtering and column selection above it.
+    """
+    # --- Pagination UI ---
+    st.subheader("Pagination Controls")
+    
+    rows_per_page = st.number_input(
+        "Number of rows per page:",
+        min_value=1,
+        value=10,
+        step=1,
+        key='rows_per_page_input'
+    )
+    
+    total_pages = (total_rows - 1) // rows_per_page + 1 if total_rows > 0 else 1
+    
+    # Reset page to 0 if the filtered data size changes drastically
+    if st.session_state.page >= total_pages:
+         st.session_state.page = max(0, total_pages - 1)
+
+    # --- Display Data, Navigation, and Download ---
+    st.subheader(f"Displaying Data (Page {st.session_state.page + 1} of {total_pages})")
+    
+    start_row = st.session_state.page * rows_per_page
+    end_row = start_row + rows_per_page
+    
+    st.dataframe(
+        fetch_page(start_row, end_row),
+        column_config=url_config,
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    # --- Navigation and Download Buttons ---
+    col1, col2, col3, col4 = st.columns([1, 1, 4, 2])
+    
+    with col1:
+        if st.button("Previous", on_click=change_page, args=(-1, total_pages)) and not st.session_state.page_changed:
+            st.warning("You're on the first page.")
+    
+    with col2:
+        if st.button("Next", on_click=change_page, args=(1, total_pages)) and not st.session_state.page_changed:
+            st.warning("You're on the last page.")
+    
+    if csv_data is not None:
+        with col4:
+            st.download_button(
+                label="Download Displayed Data as CSV ⬇️",
+                data=csv_data,
+                file_name=f'displayed_data_{pd.Timestamp.now().strftime("%Y%m%d_%H%M%S")}.csv',
+                mime='text/csv',
+                help="Downloads the data currently shown after all filtering and column selection."
+            )
+
 # --- Left Sidebar for Description and Instructions ---
 with st.sidebar:
     st.title("Dashboard Instructions 📋")
@@ -97,54 +406,81 @@ st.markdown("---")
 uploaded_file = st.file_uploader("Choose a CSV or JSON file to upload", type=["csv", "json"])
 
 if uploaded_file is not None:
-    # Use uploaded_file.seek(0) to ensure reading from the start of the file
-    uploaded_file.seek(0) 
-
     try:
-        df = None
-        error_message = None
-        
-        # Read the file based on its type
-        if uploaded_file.name.endswith('.csv'):
-            # Convert uploaded file to a string buffer for pandas to read
-            stringio = StringIO(uploaded_file.getvalue().decode("utf-8"))
-            df = pd.read_csv(stringio)
-        elif uploaded_file.name.endswith('.json'):
-            # Use the specialized JSON loading function
-            df, error_message = load_nested_json(uploaded_file)
+        # Large CSVs are never loaded whole: they are indexed by byte offset once
+        # and only the segments holding the requested rows are parsed
+        large_csv = uploaded_file.name.endswith('.csv') and uploaded_file.size > LARGE_CSV_BYTES
+        if large_csv:
+            st.info(
+                "This file is too large to load at once, so only the rows being shown are read from it. "
+                f"CSV download is available once filters narrow it to {LARGE_CSV_EXPORT_ROWS:,} rows or fewer."
+            )
+            # getvalue() returns the upload's shared bytes object, so no copy is made
+            raw = uploaded_file.getvalue()
         
-        if error_message:
-            st.error(error_message)
-            st.stop()
-            
-        if df is None or df.empty:
-            st.warning("The file was processed, but the resulting DataFrame is empty.")
-            st.stop()
-
         # Initialize or update session state variables for the original (unfiltered) data
-        # Check by name and length for a rough re-upload check
-        if 'df_original' not in st.session_state or st.session_state.df_original.shape != df.shape:
-            st.session_state.df_original = df.copy() # Store a copy of the original data
+        # The upload's file_id identifies a new file in O(1), so reruns skip loading entirely
+        if st.session_state.get('upload_key') != uploaded_file.file_id:
+            if large_csv:
+                # One pass records the segment offsets and the categorical filter columns
+                header_end, segments, df = index_large_csv(raw)
+                if len(df) == 0:
+                    st.warning("The file was processed, but the resulting DataFrame is empty.")
+                    st.stop()
+                
+                st.session_state.df_original = None
+                st.session_state.csv_index = (header_end, segments)
+                sample = read_csv_rows(
+                    uploaded_file.file_id, raw, st.session_state.csv_index,
+                    np.arange(min(URL_SAMPLE_ROWS, len(df)))
+                )
+                st.session_state.columns = sample.columns
+            else:
+                # Read the file based on its type
+                df, error_message = load_dataframe(uploaded_file.name, uploaded_file.getvalue())
+                
+                if error_message:
+                    st.error(error_message)
+                    st.stop()
+                    
+                if df is None or df.empty:
+                    st.warning("The file was processed, but the resulting DataFrame is empty.")
+                    st.stop()
+
+                # Session state is the only copy of the data kept between reruns
+                st.session_state.df_original = df
+                st.session_state.columns = df.columns
+                sample = df.head(URL_SAMPLE_ROWS)
+            
+            # Filtering only needs the categorical filter columns
+            st.session_state.filter_df = df
             st.session_state.page = 0
+            # Force the filters to be re-applied to the new data
+            st.session_state.filter_key = None
+            # Detect URL columns once per upload, on a small leading sample of the data
+            st.session_state.url_config = detect_url_columns(sample)
+            # Prepare unique options once from the categories, including "All"
+            # (distinct categories such as 1 and "1" collapse to one option)
+            st.session_state.filter_options = {
+                col_name: np.concatenate([["All"], df[col_name].cat.categories.astype(str).unique().to_numpy()])
+                for col_name in FILTER_COLS if col_name in df.columns
+            }
+            # Mark the upload as loaded only once all of its state is prepared
+            st.session_state.upload_key = uploaded_file.file_id
             
         # --- Data Filtering UI ---
         st.subheader("Data Filters")
         
-        df_to_filter = st.session_state.df_original.copy()
-        filter_cols = ["topic_name", "publisher", "publication_type"]
+        df_to_filter = st.session_state.filter_df
         active_filters = {}
         
-        # Create dropdowns for existing filter columns
-        col_list = list(df_to_filter.columns)
-        
         # Use columns for layout
         cols_for_dropdowns = st.columns(3)
         
-        for i, col_name in enumerate(filter_cols):
-            if col_name in col_list:
-                # Prepare unique options, coercing to string and including "All"
-                options = ["All"] + df_to_filter[col_name].astype(str).dropna().unique().tolist()
-                
+        # Create dropdowns for existing filter columns
+        for i, col_name in enumerate(FILTER_COLS):
+            options = st.session_state.filter_options.get(col_name)
+            if options is not None:
                 with cols_for_dropdowns[i]:
                     # The key ensures Streamlit treats this as a unique widget
                     selected_value = st.selectbox(
@@ -158,15 +494,15 @@ if uploaded_file is not None:
                         # Store the active filter
                         active_filters[col_name] = selected_value
         
-        # Apply filters to the DataFrame
-        df_filtered = df_to_filter.copy()
-        if active_filters:
-            for col, value in active_filters.items():
-                # Filter for the selected value (coerced to string for consistent comparison)
-                df_filtered = df_filtered[df_filtered[col].astype(str) == value]
-
-        # Store the filtered data in session state for subsequent use
-        st.session_state.df_filtered = df_filtered
+        # Apply filters to the DataFrame only when the selection changes
+        filter_key = tuple(sorted(active_filters.items()))
+        if st.session_state.filter_key != filter_key:
+            filtered_rows = filter_rows(df_to_filter, active_filters)
+
+            # Store only the matching row positions and their count in session state
+            st.session_state.filtered_rows = filtered_rows
+            st.session_state.total_rows = len(filtered_rows)
+            st.session_state.filter_key = filter_key
         
         st.markdown("---")
         
@@ -180,10 +516,10 @@ if uploaded_file is not None:
             key='col_select_radio'
         )
         
-        # Apply column filtering based on user choice to the *filtered* DataFrame
+        # Column filtering is applied to each page rather than the whole *filtered* DataFrame
+        all_cols = st.session_state.columns
         if col_option == "Selected Columns":
-            all_cols = list(st.session_state.df_filtered.columns)
-            # Use the filtered df columns as the basis for selection
+            # Use the original df columns as the basis for selection
             selected_cols = st.multiselect(
                 "Select the columns to display:",
                 all_cols,
@@ -193,88 +529,48 @@ if uploaded_file is not None:
             if not selected_cols:
                 st.warning("Please select at least one column to display.")
                 st.stop()
-            # *** This is the final DataFrame that is both row-filtered and column-filtered ***
-            display_df = st.session_state.df_filtered[selected_cols]
         else:
-            # *** This is the final DataFrame that is only row-filtered ***
-            display_df = st.session_state.df_filtered
+            selected_cols = all_cols
         
-        if display_df.empty:
+        if st.session_state.total_rows == 0:
             st.warning("No data matches the selected filters.")
             st.stop()
         
-        # --- Pagination UI ---
-        st.subheader("Pagination Controls")
-        
-        rows_per_page = st.number_input(
-            "Number of rows per page:",
-            min_value=1,
-            value=10,
-            step=1,
-            key='rows_per_page_input'
-        )
-        
-        total_rows = len(display_df)
-        total_pages = (total_rows - 1) // rows_per_page + 1 if total_rows > 0 else 1
-        
-        # Reset page to 0 if the filtered data size changes drastically
-        if st.session_state.page >= total_pages:
-             st.session_state.page = max(0, total_pages - 1)
-
-        # --- Display Data, Navigation, and Download ---
-        st.subheader(f"Displaying Data (Page {st.session_state.page + 1} of {total_pages})")
-        
-        start_row = st.session_state.page * rows_per_page
-        end_row = start_row + rows_per_page
-        
-        paged_df = display_df.iloc[start_row:end_row]
-        
-        # Automatically detect URL columns and configure them for clickable links
-        url_config = detect_url_columns(paged_df)
-        
-        st.dataframe(
-            paged_df,
-            column_config=url_config,
-            use_container_width=True,
-            hide_index=True
-        )
+        # Materialize only the requested page's rows from the original data, then
+        # apply the column selection so it only copies the visible rows
+        def fetch_page(start, stop):
+            page_rows = st.session_state.filtered_rows[start:stop]
+            if large_csv:
+                paged_df = read_csv_rows(uploaded_file.file_id, raw, st.session_state.csv_index, page_rows)
+            else:
+                paged_df = st.session_state.df_original.take(page_rows)
+            if col_option == "Selected Columns":
+                paged_df = paged_df[selected_cols]
+            return paged_df
         
-        # --- Navigation and Download Buttons ---
-        col1, col2, col3, col4 = st.columns([1, 1, 4, 2])
-        
-        with col1:
-            if st.button("Previous"):
-                if st.session_state.page > 0:
-                    st.session_state.page -= 1
-                    st.rerun()
-                else:
-                    st.warning("You're on the first page.")
-        
-        with col2:
-            if st.button("Next"):
-                if st.session_state.page < total_pages - 1:
-                    st.session_state.page += 1
-                    st.rerun()
-                else:
-                    st.warning("You're on the last page.")
-        
-        # --- Download Button (FIXED) ---
-        @st.cache_data
-        def convert_df_to_csv(df):
-            # IMPORTANT: Cache the conversion to prevent computation on every rerun
-            return df.to_csv(index=False).encode('utf-8')
-        
-        # *** FIX APPLIED HERE: Pass display_df (which has both row and column filtering) ***
-        csv_data = convert_df_to_csv(display_df)
-        
-        with col4:
-            st.download_button(
-                label="Download Displayed Data as CSV ⬇️",
-                data=csv_data,
-                file_name=f'displayed_data_{pd.Timestamp.now().strftime("%Y%m%d_%H%M%S")}.csv',
-                mime='text/csv',
-                help="Downloads the data currently shown after all filtering and column selection."
+        # --- Download Data ---
+        # Keyed on the upload and the filter/column state, not on the data itself
+        csv_data = None
+        if not large_csv:
+            csv_data = csv_bytes(
+                st.session_state.df_original,
+                uploaded_file.file_id,
+                filter_key,
+                tuple(selected_cols)
+            )
+        elif filter_key and st.session_state.total_rows <= LARGE_CSV_EXPORT_ROWS:
+            # Large CSVs are only exported once filtered down; an unfiltered export
+            # would be a second full-size copy of the file in memory
+            csv_data = large_csv_bytes(
+                uploaded_file.file_id,
+                filter_key,
+                tuple(selected_cols),
+                raw,
+                st.session_state.csv_index,
+                st.session_state.filtered_rows
             )
+        
+        show_data_page(fetch_page, st.session_state.total_rows, st.session_state.url_config, csv_data)
 
     except Exception as e:
         st.error(f"An unexpected error occurred while processing the file: {e}")